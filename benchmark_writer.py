@@ -0,0 +1,59 @@
+'''benchmark_writer.py
+	Times the report writer methods in fcimporter.py on synthetic weeks of featured content, to check that rendering cost stays linear in the number of items.
+	No network access is needed: the WP:GO target and the date range are stubbed out. Pywikibot must still be importable, as fcimporter.py imports it.
+	Usage: `python benchmark_writer.py [number of items ...]`, a.e. `python benchmark_writer.py 1000 10000 100000`.'''
+
+import sys
+import copy
+import random
+import timeit
+import fcimporter
+
+DEFAULT_SIZES = [1000, 2000, 4000, 8000, 16000]
+
+CONTENT_TYPES = ['Featured article', 'Featured list', 'Featured portal', 'Featured topic', 'Featured picture']
+
+def makeSyntheticWeek(number_of_items, seed=0):
+	'''Returns a list of `number_of_items` featured content dicts, of the form produced by addFeaturedContentNominators(), spread over all content types.'''
+	r = random.Random(seed)
+	ret = []
+	for i in range(0, number_of_items):
+		content_type = r.choice(CONTENT_TYPES)
+		item = {'ns': 0, 'type': content_type, 'nominators': ['User:Nominator_' + str(n) for n in range(0, r.randint(1, 3))]}
+		if content_type == 'Featured picture':
+			item['title'] = 'File:Picture ' + str(i) + '.jpg'
+			item['nomination'] = 'Wikipedia:Featured picture candidates/Picture ' + str(i)
+			item['creator'] = r.choice(['User:Creator ' + str(i), '$Creator ' + str(i), 'Creator ' + str(i)])
+		elif content_type == 'Featured topic':
+			item['title'] = 'Wikipedia:Featured topics/Topic ' + str(i)
+			item['nomination'] = 'Wikipedia:Featured topic candidates/Topic ' + str(i) + '/archive1'
+		elif content_type == 'Featured portal':
+			item['title'] = 'Portal:Portal ' + str(i)
+			item['nomination'] = 'Wikipedia:Featured portal candidates/Portal:Portal ' + str(i)
+		else:
+			item['title'] = 'Article ' + str(i)
+			item['nomination'] = 'Wikipedia:' + content_type + ' candidates/Article ' + str(i) + '/archive1'
+		ret.append(item)
+	return ret
+
+def timeWriteContentString(week, repeat=5):
+	'''Returns the best time, in seconds, of `repeat` runs of writeContentString() over `week`.
+		writeContentString() edits nominator lists in place, so every run gets a fresh copy; copying is not timed.'''
+	best = None
+	for i in range(0, repeat):
+		items = copy.deepcopy(week)
+		start = timeit.default_timer()
+		fcimporter.writeContentString(items)
+		elapsed = timeit.default_timer() - start
+		if best is None or elapsed < best:
+			best = elapsed
+	return best
+
+if __name__ == '__main__':
+	fcimporter.target = 'Wikipedia:Goings-on/March 2, 2014'
+	fcimporter.getDateRangeString = lambda: '02 March to 09 March'
+	sizes = [int(arg) for arg in sys.argv[1:]] or DEFAULT_SIZES
+	print('items'.rjust(10) + 'seconds'.rjust(12) + 'us/item'.rjust(12))
+	for size in sizes:
+		elapsed = timeWriteContentString(makeSyntheticWeek(size))
+		print(str(size).rjust(10) + ('%.4f' % elapsed).rjust(12) + ('%.2f' % (elapsed / size * 1e6)).rjust(12))
@@ -4,7 +4,6 @@
 
 import pywikibot
 import sys
-import requests
 import json
 import datetime
 import signpostlib
@@ -143,17 +142,17 @@ def getDateRangeString():
 	'''WRITER HELPER METHOD: Returns the date range string that is used to report the time period covered by the report.'''
 	return getPreviousGODate().strftime('%d %B') + ' to ' + (getPreviousGODate() + datetime.timedelta(days=7)).strftime('%d %B')
 
-def extractFeaturedContentOfOneType(list_param, content_type):
-	'''DICTIONARY HELPER METHOD: An extraction method that returns a list of dicts associated with one specific featured content type.
-	This is used to de-glob the work that needs to be done in generating the output string.'''
-	ret = []
-	for i in range(0, len(list_param)):
-		if list_param[i]['type'] == content_type:
-			ret.append(list_param[i])
+def groupFeaturedContentByType(list_param):
+	'''DICTIONARY HELPER METHOD: A grouping method that sorts a list of dicts by featured content type in a single pass, preserving their order within each type.
+	This is used to de-glob the work that needs to be done in generating the output string.
+	Returns a dict of the form {'Featured article': [{...}, ...], 'Featured list': [...], ...}; types with no items are absent.'''
+	ret = {}
+	for item in list_param:
+		ret.setdefault(item['type'], []).append(item)
 	return ret
 
 def stripSubpage(string):
-	'''DICTIONARY HELPER METHOD: Strips content before colons and slashes out of a string. Used as a text transform in writeContentStringForFeaturedContentType().
+	'''DICTIONARY HELPER METHOD: Strips content before colons and slashes out of a string. Used as a text transform in generateContentForFeaturedContentType().
 		Used to generate a link, so that we can get the simplest linking possible: either [[James Franco|]], not [[James Franco|James Franco]].
 		And [[Wikipedia:Featured topics/Overview of Lorde|Overview of Lorde]], not [[Wikipedia:Featured topics/Overview of Lorde|Featured topics/Overview of Lorde]].'''
 	while ':' in string:
@@ -171,8 +170,8 @@ def stripSubpage(string):
 
 def requestData(api_request_parameters):
 	'''API HELPER METHOD: A method to construct API requests with. Takes a dictionary of request parameters, returns the text of the query.
-		This method uses the requests library to handle concatenating the API request string and actually retrieving the data.'''
-	r = requests.get("https://en.wikipedia.org/w/api.php?", params=api_request_parameters)
+		This method uses the requests library, by way of signpostlib.makeRequest(), to handle concatenating the API request string and actually retrieving the data.'''
+	r = signpostlib.makeRequest('api', 'GET', "https://en.wikipedia.org/w/api.php?", params=api_request_parameters)
 	return json.loads(r.text)
 
 def stripAPIData(query, type):
@@ -403,7 +402,7 @@ def addFeaturedPictureNomination(featured_picture_item):
 def addFeaturedContentNominators(featured_content_item):
 	'''DICTIONARY EXECUTION METHOD: A method which takes as an input a dict of the form `{'title': 'article_title', 'ns': '#', 'type': 'Featured article', 'nomination': 'Wikipedia:Featured article candidates/article_title/archiveN'}`.
 		It then carves out the names of the content nominators. It does this by isolating the segment of data where the interesting users occur, and then sending it to getListOfUniqueUsersFromData().'''
-	data = requests.get('https://en.wikipedia.org/wiki/' + featured_content_item['nomination']).text
+	data = signpostlib.getPageHTML(featured_content_item['nomination'])
 	# print(data + '\n\n\n')
 	list_of_nominators = []
 	if featured_content_item['type'] == 'Featured article' or featured_content_item['type'] == 'Featured list':
@@ -443,46 +442,63 @@ def addFeaturedContentNominators(featured_content_item):
 ##################
 #
 # These are the methods that, in the end step of this script's running, compile the actual report to be published onto the wiki.
+# The fixed parts of the report's layout are laid out once, in the constants below. The generate*() methods then yield the report piece by piece, in a single pass over the items,
+# so that writeContentString() can join the pieces in one go (or a caller can stream them straight into a file with `f.writelines(generateContent(...))`).
 #
 
-def writeContentStringForFeaturedContentType(list_param, content_type):
-	'''DICTIONARY EXECUTION METHOD: A method which takes as an input a dict of the form `{'title': 'article_title', 'ns': '#', 'type': 'Featured article', 'nomination': 'Wikipedia:Featured article candidates/article_title/archiveN'}`.
-		It then carves out the names of the content nominators. It does this by isolating the segment of data where the interesting users occur, and then sending it to getListOfUniqueUsersFromData().'''
-	ret = ''
-	list_of_stuff = extractFeaturedContentOfOneType(list_param, content_type)
+REPORT_HEADER_START = '''{{Signpost draft}}
+<noinclude>{{Wikipedia:Signpost/Template:Signpost-header|||}}</noinclude>
+
+{{Wikipedia:Signpost/Template:Signpost-article-start|{{{1|This Week's Featured Content}}}|By [[User:{{subst:REVISIONUSER}}|]]| {{subst:#time:j F Y|{{subst:Wikipedia:Wikipedia Signpost/Issue|4}}}}}}
+
+[[File:bar.jpg|thumb|600px|center|Lead image caption. Tweak width as appropriate]]
+
+----
+<center>'\'\'\'\'This \'\'Signpost\'\' \"Featured content\" report covers material promoted from '''
+
+REPORT_HEADER_END = '''.\'\'\'\''</center>
+----
+'''
+
+REPORT_FOOTER = '''
+{{-}}
+[[File:bar.jpg|thumb|600px|center|Footer image caption. Tweak width as appropriate]]
+
+<noinclude>{{Wikipedia:Signpost/Template:Signpost-article-comments-end||{{subst:Wikipedia:Wikipedia Signpost/Issue|1}}|{{subst:Wikipedia:Wikipedia Signpost/Issue|5}}}}</noinclude>'''
+
+# Placeholder images placed at the top of the featured article and featured list sections.
+SECTION_LEAD_IMAGES = {
+	'Featured article': '\n' + '[[File:Foo.jpg|thumb|300px|Caption of first FA to display]] <!--Repeat as appropriate-->' + '\n',
+	'Featured list': '\n' + '[[File:Foo.jpg|thumb|300px|Caption of first FL to display]] <!--Repeat as appropriate-->' + '\n'
+}
+
+# The featured picture section is written as a gallery. This has already had the gallery caption workaround (see generateContentForFeaturedPicture()) applied to it.
+FEATURED_PICTURE_SECTION_START = '{{clear}}\n' + '===' + 'Featured picture' + 's===' + '\n'
+FEATURED_PICTURE_SECTION_INTRO_END = ' [[Wikipedia:' + 'featured pictures' + ']]s were promoted this week.' + "<gallery mode=packed heights=225px>"
+
+def generateContentForFeaturedContentType(list_of_stuff, content_type):
+	'''DICTIONARY EXECUTION METHOD: A method which takes as an input a list of dicts of one featured content type, each of the form `{'title': 'article_title', 'ns': '#', 'type': 'Featured article', 'nomination': 'Wikipedia:Featured article candidates/article_title/archiveN', 'nominators': [...]}`.
+		It then yields, piece by piece, that type's section of the report: a header, an introductory line, and one line per item. Nothing is yielded for an empty list.'''
 	if len(list_of_stuff) == 0:
-		return ret
-	ret += '===' + content_type + 's===' + '\n'
-	if list_of_stuff[0]['type'] == 'Featured article':
-		ret += '\n' + '[[File:Foo.jpg|thumb|300px|Caption of first FA to display]] <!--Repeat as appropriate-->' + '\n' 
-	elif list_of_stuff[0]['type'] == 'Featured list': # Featured list case.
-		ret += '\n' + '[[File:Foo.jpg|thumb|300px|Caption of first FL to display]] <!--Repeat as appropriate-->' + '\n' 
-	ret += '{{ucfirst:{{numtext|' + str(len(list_of_stuff)) + '}}}}' + ' [[Wikipedia:' + content_type.lower() + '|]]s were promoted this week.'
+		return
+	yield '===' + content_type + 's===' + '\n'
+	if content_type in SECTION_LEAD_IMAGES:
+		yield SECTION_LEAD_IMAGES[content_type]
+	yield '{{ucfirst:{{numtext|' + str(len(list_of_stuff)) + '}}}}' + ' [[Wikipedia:' + content_type.lower() + '|]]s were promoted this week.'
 	for item in list_of_stuff:
-		ret += '\n* <b>' + '[[:' + item['title'] + '|' + stripSubpage(item['title']) + ']]</b> <small>\'\'('
-		ret += '[[' + item['nomination'] + '|nominated]] by ' + makeContributorsStringFromList(item['nominators']) + ')\'\'</small> '
-	return ret
+		yield '\n* <b>' + '[[:' + item['title'] + '|' + stripSubpage(item['title']) + ']]</b> <small>\'\'(' + '[[' + item['nomination'] + '|nominated]] by ' + makeContributorsStringFromList(item['nominators']) + ')\'\'</small> '
 
-def writeContentStringForFeaturedPicture(list_param):
-	'''DICTIONARY SUB-EXECUTION METHOD: A method that does the same as the above, but is special to featured pictures, which must provide two more things:
-		1. A creator.
-		2. Check the string to see if it contains File:, if not then use that string as the description instead of the filename.'''
-	ret = ''
-	list_of_stuff = extractFeaturedContentOfOneType(list_param, 'Featured picture')
+def generateContentForFeaturedPicture(list_of_stuff):
+	'''DICTIONARY SUB-EXECUTION METHOD: A method that does the same as the above, but is special to featured pictures, which must provide one more thing: a creator.
+		Featured pictures are written as a gallery. A bug in picture captions causes smart link piping, e.g. [[NASA|]] or [[User:Resident Mario|]], to not work, so as a workaround
+		every `|]]` in a caption is replaced by `]]`. This is done line by line, as each line is written, rather than over the finished section.'''
 	if len(list_of_stuff) == 0:
-		return ret
-	ret += '{{clear}}\n' + '===' + 'Featured picture' + 's===' + '\n'
-	ret += '{{ucfirst:{{numtext|' + str(len(list_of_stuff)) + '}}}}' + ' [[Wikipedia:' + 'featured pictures' + '|]]s were promoted this week.'
-	ret += "<gallery mode=packed heights=225px>"
+		return
+	yield FEATURED_PICTURE_SECTION_START
+	yield '{{ucfirst:{{numtext|' + str(len(list_of_stuff)) + '}}}}' + FEATURED_PICTURE_SECTION_INTRO_END
 	for item in list_of_stuff:
-		if 'File:' in item['nomination']:
-			ret += '\n' + item['title'] + '| '
-		else:
-			ret += '\n' + item['title'] + '| '
-		ret += '<small>\'\'(created by ' + makeCreatorString(item['creator']) + '; ' + '[[' + item['nomination'] + '|nominated]] by ' + makeContributorsStringFromList(item['nominators']) + ')\'\'</small> '
-	# Final loop: a workaround for a bug in picture captions that causes smart link piping, e.g. [[NASA|]] or [[User:Resident Mario|]] to not work.
-	ret = ret.replace('|]]',']]')
-	return ret
+		line = '\n' + item['title'] + '| ' + '<small>\'\'(created by ' + makeCreatorString(item['creator']) + '; ' + '[[' + item['nomination'] + '|nominated]] by ' + makeContributorsStringFromList(item['nominators']) + ')\'\'</small> '
+		yield line.replace('|]]', ']]')
 
 def getCreator(raw_data):
 	'''DICTIONARY SUB-EXECUTION METHOD: A method which retrieves the creator of a Featured picture, given the raw HTML data of a featured picture nomination.'''
@@ -515,33 +531,28 @@ def getCreator(raw_data):
 	else:
 		return '???'
 
+def generateContent(list_of_featured_item_dicts):
+	'''RUNTIME METHOD: Yields, piece by piece, the content string that will be written to the page at the end of this script's running time.
+		The items are grouped by type once, up front, and each item is then written exactly once.'''
+	grouped = groupFeaturedContentByType(list_of_featured_item_dicts)
+	yield REPORT_HEADER_START + getDateRangeString() + REPORT_HEADER_END
+	yield "\n<!-- Content initially imported from '" + target + "' via Resident Mario's FC-Importer script. -->"
+	yield '\n\n'
+	yield from generateContentForFeaturedContentType(grouped.get('Featured article', []), 'Featured article')
+	yield '\n\n'
+	yield from generateContentForFeaturedContentType(grouped.get('Featured list', []), 'Featured list')
+	yield '\n'
+	yield from generateContentForFeaturedContentType(grouped.get('Featured portal', []), 'Featured portal')
+	yield '\n'
+	yield from generateContentForFeaturedContentType(grouped.get('Featured topic', []), 'Featured topic')
+	yield '\n'
+	yield from generateContentForFeaturedPicture(grouped.get('Featured picture', []))
+	yield '\n\n' + REPORT_FOOTER
+
 def writeContentString(list_of_featured_item_dicts):
 	'''RUNTIME METHOD: Generates the content string that will be written to the page at the end of this script's running time.
 		This is the penultimate method to be called; once it is done all that remains is to write the content to wherever it needs to be.'''
-	ret = '''{{Signpost draft}}
-<noinclude>{{Wikipedia:Signpost/Template:Signpost-header|||}}</noinclude>
-
-{{Wikipedia:Signpost/Template:Signpost-article-start|{{{1|This Week's Featured Content}}}|By [[User:{{subst:REVISIONUSER}}|]]| {{subst:#time:j F Y|{{subst:Wikipedia:Wikipedia Signpost/Issue|4}}}}}}
-
-[[File:bar.jpg|thumb|600px|center|Lead image caption. Tweak width as appropriate]]
-
-----
-<center>'\'\'\'\'This \'\'Signpost\'\' \"Featured content\" report covers material promoted from ''' + getDateRangeString() + '''.\'\'\'\''</center>
-----
-'''
-	ret += "\n<!-- Content initially imported from '" + target + "' via Resident Mario's FC-Importer script. -->" 
-	ret += '\n' + '' + '\n' + writeContentStringForFeaturedContentType(list_of_featured_item_dicts, 'Featured article')
-	ret += '\n' + '' + '\n' + writeContentStringForFeaturedContentType(list_of_featured_item_dicts, 'Featured list')
-	ret += '\n' + writeContentStringForFeaturedContentType(list_of_featured_item_dicts, 'Featured portal')
-	ret += '\n' + writeContentStringForFeaturedContentType(list_of_featured_item_dicts, 'Featured topic')
-	ret += '\n' + '' + writeContentStringForFeaturedPicture(list_of_featured_item_dicts)
-	# For reasons unknown to me removing the empty string ('') in the lines above causes consistent key error failures.
-	ret += '\n\n' + '''
-{{-}}
-[[File:bar.jpg|thumb|600px|center|Footer image caption. Tweak width as appropriate]]
-
-<noinclude>{{Wikipedia:Signpost/Template:Signpost-article-comments-end||{{subst:Wikipedia:Wikipedia Signpost/Issue|1}}|{{subst:Wikipedia:Wikipedia Signpost/Issue|5}}}}</noinclude>'''
-	return ret
+	return ''.join(generateContent(list_of_featured_item_dicts))
 
 ##################
 # RUNTIME SCRIPT #
@@ -560,4 +571,6 @@ if __name__ == '__main__':
 	to_be_written = writeContentString(featuredContent)
 	content_target = setContentTargetPage()
 	signpostlib.saveContentToPage(to_be_written, content_target, 'Importing basic Featured Content report via the [https://github.com/ResidentMario/FC_Importer FC_Importer] script.')
+	print("Request latencies:")
+	signpostlib.printLatencyReport()
 	print("Done!")
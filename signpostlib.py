@@ -9,6 +9,9 @@
 import pywikibot
 import requests
 import datetime
+import time
+import random
+import concurrent.futures
 
 #############################
 # SIGNPOST-SPECIFIC METHODS #
@@ -51,6 +54,127 @@ def getSignpostContents(pub_string):
 		NOTE: To get the the sections of the latest issue use `getSignpostContents(getPreviousSignpostPublicationString(ns=False))`.'''
 	return makeRawAPIQuery(action='query', list='allpages', apnamespace='4', apprefix=pub_string, aplimit=20)
 
+#######################
+# HTTP POLICY METHODS #
+#######################
+#
+# Every outbound `requests` call in this library and in `fcimporter.py` goes through `makeRequest()`, which applies the policy below.
+# Policies are keyed by endpoint:
+#	`api`:		The MediaWiki JSON API (`/w/api.php`).
+#	`wiki`:		Rendered page HTML (`/wiki/...`).
+#	`index`:	Raw and purged page views (`/w/index.php?...`).
+#	`restbase`:	The RESTBase transform service.
+# Fields:
+#	`connect_timeout`, `read_timeout`:	Seconds, passed straight to `requests`.
+#	`retries`:							How many times a failed idempotent (GET) request is re-attempted. POSTs are never retried.
+#	`backoff_base`, `backoff_cap`:		Retries sleep a random ("full jitter") interval between 0 and min(cap, base * 2 ** attempt) seconds.
+#	`hedge_after`:						If set, a read that has not answered within this many seconds is duplicated and whichever copy answers first wins.
+#										Off by default so as to not double our load on Wikimedia; turn it on with `setEndpointPolicy('api', hedge_after=2.0)`.
+#
+
+ENDPOINT_POLICIES = {
+	'api': {'connect_timeout': 5, 'read_timeout': 30, 'retries': 4, 'backoff_base': 1, 'backoff_cap': 30, 'hedge_after': None},
+	'wiki': {'connect_timeout': 5, 'read_timeout': 30, 'retries': 4, 'backoff_base': 1, 'backoff_cap': 30, 'hedge_after': None},
+	'index': {'connect_timeout': 5, 'read_timeout': 30, 'retries': 4, 'backoff_base': 1, 'backoff_cap': 30, 'hedge_after': None},
+	'restbase': {'connect_timeout': 5, 'read_timeout': 60, 'retries': 0, 'backoff_base': 1, 'backoff_cap': 30, 'hedge_after': None}
+}
+
+# HTTP status codes that are worth another attempt: rate limiting and transient server-side failures.
+RETRYABLE_STATUS_CODES = (429, 500, 502, 503, 504)
+
+# Per-endpoint lists of request latencies, in seconds, recorded by `makeRequest()`.
+_latencies = {}
+
+# Thread pool used to run hedged requests. Created on first use.
+_hedge_pool = None
+
+def setEndpointPolicy(endpoint, **_fields):
+	'''CONFIGURATION METHOD: Overrides fields of the policy for one endpoint, a.e. `setEndpointPolicy('api', read_timeout=60, hedge_after=2.0)`.
+		PARAMETERS:
+		(req) endpoint:		One of the keys of `ENDPOINT_POLICIES`.
+		(kwr) _fields:		Policy fields to override.'''
+	for field in _fields:
+		if field not in ENDPOINT_POLICIES[endpoint]:
+			raise KeyError("'" + field + "' is not a valid policy field. Valid fields are: " + ', '.join(sorted(ENDPOINT_POLICIES[endpoint].keys())) + '.')
+	ENDPOINT_POLICIES[endpoint].update(_fields)
+
+def _sendOnce(method, url, timeout, **_kwargs):
+	'''HELPER METHOD: Sends a single request, with no retrying or hedging.'''
+	return requests.request(method, url, timeout=timeout, **_kwargs)
+
+def _sendHedged(method, url, timeout, hedge_after, **_kwargs):
+	'''HELPER METHOD: Sends a request, and if it has not returned within `hedge_after` seconds sends a duplicate. Returns whichever response arrives first.
+		An exception is only raised if both copies fail.'''
+	global _hedge_pool
+	if _hedge_pool is None:
+		_hedge_pool = concurrent.futures.ThreadPoolExecutor(max_workers=8)
+	pending = [_hedge_pool.submit(_sendOnce, method, url, timeout, **_kwargs)]
+	done, _ = concurrent.futures.wait(pending, timeout=hedge_after)
+	if not done:
+		pending.append(_hedge_pool.submit(_sendOnce, method, url, timeout, **_kwargs))
+	error = None
+	for future in concurrent.futures.as_completed(pending):
+		try:
+			return future.result()
+		except requests.exceptions.RequestException as e:
+			error = e
+	raise error
+
+def makeRequest(endpoint, method, url, **_kwargs):
+	'''EXECUTION METHOD: Sends an HTTP request under the timeout, retry and hedging policy for `endpoint` (see `ENDPOINT_POLICIES`), and records its latency.
+		Connection errors, timeouts and the status codes in `RETRYABLE_STATUS_CODES` are retried for GET requests only.
+		Once retries are exhausted a connection error is re-raised, while a bad status code is returned as-is, as it would be by `requests`.
+		PARAMETERS:
+		(req) endpoint:		The policy to apply, one of the keys of `ENDPOINT_POLICIES`.
+		(req) method:		The HTTP method, a.e. `GET`.
+		(req) url:			The URL to request.
+		(kwr) _kwargs:		Additional parameters passed to `requests.request()` (a.e. `params` or `data`).'''
+	policy = ENDPOINT_POLICIES[endpoint]
+	timeout = (policy['connect_timeout'], policy['read_timeout'])
+	idempotent = method.upper() == 'GET'
+	retries = policy['retries'] if idempotent else 0
+	start = time.time()
+	attempt = 0
+	while True:
+		try:
+			if idempotent and policy['hedge_after'] is not None:
+				r = _sendHedged(method, url, timeout, policy['hedge_after'], **_kwargs)
+			else:
+				r = _sendOnce(method, url, timeout, **_kwargs)
+			if r.status_code not in RETRYABLE_STATUS_CODES or attempt >= retries:
+				break
+			print("WARNING: " + url + " returned HTTP " + str(r.status_code) + ". Retrying...")
+		except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+			if attempt >= retries:
+				_latencies.setdefault(endpoint, []).append(time.time() - start)
+				raise
+			print("WARNING: " + url + " failed (" + type(e).__name__ + "). Retrying...")
+		time.sleep(random.uniform(0, min(policy['backoff_cap'], policy['backoff_base'] * 2 ** attempt)))
+		attempt += 1
+	_latencies.setdefault(endpoint, []).append(time.time() - start)
+	return r
+
+def getLatencyPercentiles(percentiles=(50, 90, 99)):
+	'''SEEKER METHOD: Returns the latency percentiles, in seconds, of every request made through `makeRequest()` so far, by endpoint.
+		Latencies cover the whole call, retries and backoff included. Percentiles are computed using the nearest-rank method.
+		PARAMETERS:
+		(opt) percentiles:	The percentiles to compute. 50, 90 and 99 by default.
+		RETURNS: A dict of the form {'api': {'count': 42, 50: 0.21, 90: 0.48, 99: 1.7}, ...}.'''
+	ret = {}
+	for endpoint in _latencies:
+		samples = sorted(_latencies[endpoint])
+		ret[endpoint] = {'count': len(samples)}
+		for p in percentiles:
+			rank = max(1, -(-p * len(samples) // 100))
+			ret[endpoint][p] = samples[rank - 1]
+	return ret
+
+def printLatencyReport():
+	'''EXECUTION METHOD: Pretty printer for the output of `getLatencyPercentiles()`.'''
+	report = getLatencyPercentiles()
+	for endpoint in sorted(report.keys()):
+		print(endpoint + ": " + str(report[endpoint]['count']) + " requests, p50 " + '%.2f' % report[endpoint][50] + "s, p90 " + '%.2f' % report[endpoint][90] + "s, p99 " + '%.2f' % report[endpoint][99] + "s")
+
 ########################
 # GENERAL DATA METHODS #
 ########################
@@ -60,7 +184,7 @@ def getPageHTML(page, language='en', project='wikipedia'):
 		PARAMETERS:
 		(req) pub_string:		The string-title to look for things in (e.g. `Wikipedia:Wikipedia Signpost/2015-04-09`)
 		NOTE: To get the the sections of the latest issue use `getSignpostContents(getPreviousSignpostPublicationString(ns=False))`.'''
-	return requests.get('https://' + language + '.' + project + '.org/wiki/' + page).text
+	return makeRequest('wiki', 'GET', 'https://' + language + '.' + project + '.org/wiki/' + page).text
 
 def getPurgedPageHTML(page, language='en', project='wikipedia'):
 	'''SEEKER METHOD: Returns a page's HTML, differing from the method above in implementation.
@@ -72,7 +196,7 @@ def getPurgedPageHTML(page, language='en', project='wikipedia'):
 	# page.purge()
 	# return page.expand_text()
 	# The above should work if the below does not.
-	return requests.get('https://' + language + '.' + project + '.org/w/index.php?title=' + page + '&action=purge&action=view').text
+	return makeRequest('index', 'GET', 'https://' + language + '.' + project + '.org/w/index.php?title=' + page + '&action=purge&action=view').text
 
 def getPageWikicode(page, language='en', project='wikipedia'):
 	'''EXECUTION METHOD: Returns the wikicode contents of a wiki page.
@@ -80,13 +204,13 @@ def getPageWikicode(page, language='en', project='wikipedia'):
 		(req) page:			Page to return the contents of.
 		(opt) language:		Language of the project, en is the default.
 		(opt) project:		Project, wikipedia is the default.'''
-	return requests.get('https://' + language + '.' + project + '.org/w/index.php?&action=raw&title=' + page).text
+	return makeRequest('index', 'GET', 'https://' + language + '.' + project + '.org/w/index.php?&action=raw&title=' + page).text
 
 def htmlToWikitext(html):
 	'''EXECUTION METHOD: A simple RESTBase API query method which converts HTML to Wikitext.
 		PARAMETERS:
 		(req) html:			HTML string to parse into wikicode.'''
-	return requests.post('https://rest.wikimedia.org:443/en.wikipedia.org/v1/transform/html/to/wikitext', data={'html': html}).text
+	return makeRequest('restbase', 'POST', 'https://rest.wikimedia.org:443/en.wikipedia.org/v1/transform/html/to/wikitext', data={'html': html}).text
 
 def makeRawAPIQuery(language='en', project='wikipedia', **_params):
 	'''EXECUTION METHOD: A light wrapper of `pywikibot.data.api.Requests` that implements free-form JSON API queries.